@@ -2,11 +2,14 @@ from __future__ import annotations
 from typing import Any
 
 import os
-from flask import Blueprint, jsonify, request
-from .utils import current_user
-from models import db, GlutenScan, AIMessage, Profile
+import re
+from flask import Blueprint, current_app, jsonify, request
+from .utils import current_user, current_user_id
+from models import db, GlutenScan, AIMessage
 from datetime import datetime
 from config import Config
+from utils.gemini import get_model
+from tasks import persist_ai_message
 
 bp = Blueprint("ai", __name__)
 
@@ -23,7 +26,12 @@ def _auth():
 # ----- Gluten Snap -----
 @bp.route("/gluten_scans", methods=["GET"])
 def list_scans() -> Any:
-    return jsonify([s.to_dict() for s in _u().gluten_scans])
+    scans = (
+        GlutenScan.query.filter_by(user_id=current_user_id())
+        .order_by(GlutenScan.created_at.asc(), GlutenScan.id.asc())
+        .all()
+    )
+    return jsonify([s.to_dict() for s in scans])
 
 def _short_label_from(analysis_result: dict) -> str:
     conf = (analysis_result.get("confidence") or "").strip().lower()
@@ -51,7 +59,7 @@ def create_scan() -> Any:
     short_tag = _short_label_from(analysis_result)[:32]
     
     scan = GlutenScan(
-        user_id=_u().id,
+        user_id=current_user_id(),
         image_url="<provided>",
         result_tag=short_tag,
         created_at=datetime.utcnow()
@@ -72,14 +80,23 @@ def create_scan() -> Any:
 
 @bp.route("/gluten_scans/<int:scan_id>", methods=["DELETE"])
 def delete_scan(scan_id: int) -> Any:
-    user = _u()
-    scan = GlutenScan.query.filter_by(id=scan_id, user_id=user.id).first()
+    scan = GlutenScan.query.filter_by(id=scan_id, user_id=current_user_id()).first()
     if not scan:
         return jsonify(error="Not found"), 404
     db.session.delete(scan)
     db.session.commit()
     return jsonify({"status": "deleted", "id": scan_id})
 
+# Picks fields out of the free-text vision response in one pass. Each line
+# is tried against the groups in priority order: food name, gluten, confidence.
+_ANALYSIS_LINE_RE = re.compile(
+    r"^(?:(?P<food>.*(?:dish:|dish is|this is|looks like|appears to be).*)"
+    r"|(?P<gluten>.*gluten.*)"
+    r"|(?P<confidence>.*(?:confidence|certain|sure).*))$",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+
 def analyze_food_image(image_data: str) -> dict:
     """Analyze a food image using Gemini Vision API.
 
@@ -98,21 +115,20 @@ def analyze_food_image(image_data: str) -> dict:
         }
 
     try:
-        import google.generativeai as genai
-        from PIL import Image
-        import io
         import base64
         
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-2.0-flash')
+        model = get_model(api_key)
         
-        # Convert base64 image data to PIL Image
+        # Decode base64 image data. A data URL prefix ("data:image/png;base64,")
+        # supplies the MIME type and is skipped with one slice; split() would
+        # copy every segment of the (potentially multi-MB) payload.
+        mime_type = "image/jpeg"
+        start = 0
         if image_data.startswith('data:image'):
-            # Remove data URL prefix if present
-            image_data = image_data.split(',')[1]
-        
-        image_bytes = base64.b64decode(image_data)
-        image = Image.open(io.BytesIO(image_bytes))
+            comma = image_data.find(',')
+            mime_type = image_data[5:comma].split(';', 1)[0] or mime_type
+            start = comma + 1
+        image_bytes = base64.b64decode(image_data[start:])
         
         # Concise prompt (trimmed to reduce load and error surface)
         prompt = (
@@ -121,23 +137,22 @@ def analyze_food_image(image_data: str) -> dict:
             "(high/medium/low). Keep it short and practical."
         )
         
-        # Updated API call format for current Gemini
-        response = model.generate_content([image, prompt])
+        # Raw bytes go straight to Gemini; no local image decode needed
+        response = model.generate_content([{"mime_type": mime_type, "data": image_bytes}, prompt])
         analysis_text = response.text
         
         # Extract key information from the analysis
-        lines = analysis_text.split('\n')
         food_name = "Analyzed Food"
         gluten_assessment = "Assessment pending"
         confidence = "medium"
         
-        for line in lines:
-            low = line.lower()
-            if any(word in low for word in ['dish:', 'dish is', 'this is', 'looks like', 'appears to be']):
-                food_name = line.strip()[:50]
-            elif 'gluten' in low:
-                gluten_assessment = line.strip()
-            elif 'confidence' in low or 'certain' in low or 'sure' in low:
+        for m in _ANALYSIS_LINE_RE.finditer(analysis_text):
+            if m.group('food') is not None:
+                food_name = m.group('food').strip()[:50]
+            elif m.group('gluten') is not None:
+                gluten_assessment = m.group('gluten').strip()
+            else:
+                low = m.group('confidence').lower()
                 if 'high' in low:
                     confidence = "high"
                 elif 'low' in low:
@@ -188,9 +203,7 @@ def food_chat() -> Any:
         })
     
     try:
-        import google.generativeai as genai
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-2.0-flash')
+        model = get_model(api_key)
         
         # Trimmed chat prompt; do not resend image here. Chat relies on
         # short text context returned from the single image analysis call.
@@ -229,9 +242,7 @@ def generate_encouragement() -> str:
         return "You're doing great! Keep up the hard work."
     
     try:
-        import google.generativeai as genai
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-2.0-flash')
+        model = get_model(api_key)
         
         prompt = "Write a short, uplifting, and encouraging message for someone tracking their health. Make it sound personal and optimistic. Less than 25 words"
         response = model.generate_content(prompt)
@@ -247,28 +258,24 @@ def get_encouragement_message() -> Any:
     """Generate and return a new encouragement message."""
     message_text = generate_encouragement()
     
-    # Create and save the message to the database
-    new_message = AIMessage(
-        user_id=_u().id,
-        message=message_text,
-        created_at=datetime.utcnow()
-    )
-    db.session.add(new_message)
-    db.session.commit()
+    # Save the message in the background; the client only needs the text
+    created_at = datetime.utcnow()
+    persist_ai_message(current_app._get_current_object(), current_user_id(), message_text, created_at)
     
-    return jsonify(new_message.to_dict())
+    return jsonify({"id": None, "message": message_text, "created_at": created_at.isoformat()})
 
 
 @bp.route("/ai_messages", methods=["GET"])
 def latest_msg() -> Any:
+    user = _u()
     msg = (
-        AIMessage.query.filter_by(user_id=_u().id)
+        AIMessage.query.filter_by(user_id=user.id)
         .order_by(AIMessage.created_at.desc())
         .first()
     )
     # Attach trimester info for frontend convenience
     trimester = "-"
-    prof = Profile.query.filter_by(user_id=_u().id).first()
+    prof = user.profile
     if prof:
         from datetime import date as _date
         from utils.gestation import calculate_by_lmp, calculate_by_due
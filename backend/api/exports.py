@@ -1,13 +1,28 @@
 from __future__ import annotations
 from typing import Any, List
 
-from flask import Blueprint, jsonify, request
-from .utils import current_user
-from models import Symptom, Profile, Lab, GlutenScan, db, Medication
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from .utils import current_user, latest_labs
+from utils.gemini import get_model
+from models import Symptom, Lab, GlutenScan, db, Medication, bump_revision
 from datetime import datetime, timedelta
 
 bp = Blueprint("exports", __name__)
 
+# Only the most recent symptoms get an AI suggestion; Gemini calls for
+# those run concurrently since each one is a network round-trip.
+_AI_SUGGESTION_LIMIT = 10
+_AI_MAX_WORKERS = 8
+
+
+@lru_cache(maxsize=1024)
+def _cached_suggestion(api_key: str, prompt: str) -> str:
+    # The prompt already encodes trimester, symptom, severity, labs and
+    # gluten context, so an identical prompt gets the same answer back.
+    return get_model(api_key).generate_content(prompt).text.strip()
+
 def _u(): return current_user()
 
 @bp.before_request
@@ -30,10 +45,11 @@ def export_summary() -> Any:
     except Exception:
         pass
     user = _u()
-    since = datetime.utcnow() - timedelta(days=days)
+    now = datetime.utcnow()
+    since = now - timedelta(days=days)
 
     # Load pregnancy profile
-    prof = Profile.query.filter_by(user_id=user.id).first()
+    prof = user.profile
     tri = '-'
     if prof:
         from datetime import date as _date
@@ -44,24 +60,19 @@ def export_summary() -> Any:
         elif prof.due_date:
             tri = calculate_by_due(prof.due_date, today).get('trimester', '-')  # type: ignore
 
-    # Recent labs (last TSH/FT4)
-    last_tsh = (
-        Lab.query.filter(Lab.user_id == user.id, Lab.test_name.in_(["TSH", "tsh", "Tsh"]))
-        .order_by(Lab.test_date.desc(), Lab.id.desc())
-        .first()
-    )
-    last_ft4 = (
-        Lab.query.filter(Lab.user_id == user.id, Lab.test_name.in_(["FT4", "ft4", "Ft4"]))
-        .order_by(Lab.test_date.desc(), Lab.id.desc())
-        .first()
-    )
+    # Recent labs (last TSH/FT4), both in one round-trip
+    labs = latest_labs(user.id, "TSH", "FT4")
+    last_tsh = labs.get("TSH")
+    last_ft4 = labs.get("FT4")
 
     # Gluten scans last 3 days summary
     gs_count = (
-        GlutenScan.query.filter(
+        db.session.query(db.func.count(GlutenScan.id))
+        .filter(
             GlutenScan.user_id == user.id,
-            GlutenScan.created_at >= datetime.utcnow() - timedelta(days=3),
-        ).count()
+            GlutenScan.created_at >= now - timedelta(days=3),
+        )
+        .scalar()
     )
     gluten_events = f"{gs_count} scan(s) in last 3 days"
 
@@ -82,47 +93,72 @@ def export_summary() -> Any:
     model = None
     if use_ai:
         try:
-            import google.generativeai as genai
-            genai.configure(api_key=api_key)
-            model = genai.GenerativeModel('gemini-2.0-flash')
+            model = get_model(api_key)
         except Exception:
             model = None
             use_ai = False
 
+    last_lab = last_tsh or last_ft4
+    lab_context = (
+        f"最近一次甲状腺化验（{last_lab.test_date.isoformat() if last_lab else '无'}）"
+        f"TSH={last_tsh.result if last_tsh else 'NA'} mIU/L, FT4={last_ft4.result if last_ft4 else 'NA'} ng/dL。\n"
+    )
+
+    prompts: List[str] = []
     for s in symptoms:
-        row = {
+        out.append({
             "date": s.logged_at.date().isoformat(),
             "symptom_name": s.symptom,
             "severity": s.severity,
             "note": s.note,
             "ai_suggestion": None,
             "disclaimer": disclaimer,
-        }
-        if use_ai and model:
-            try:
-                prompt = (
-                    "你是一名健康生活建议助手。\n"
-                    f"孕期分期 {tri}，症状：{s.symptom}，严重程度 {s.severity}/5。\n"
-                    f"最近一次甲状腺化验（{(last_tsh or last_ft4).test_date.isoformat() if (last_tsh or last_ft4) else '无'}）"
-                    f"TSH={last_tsh.result if last_tsh else 'NA'} mIU/L, FT4={last_ft4.result if last_ft4 else 'NA'} ng/dL。\n"
-                    f"最近 3 天 Gluten Snap 结果：{gluten_events}。\n"
-                    "请用简洁、温和、无医疗处方的语言，提供 1-2 条生活建议；避免诊断和药物建议。\n"
-                    "在结尾加“仅供参考，不构成医疗建议，请遵医嘱”。"
-                )
-                resp = model.generate_content(prompt)
-                row["ai_suggestion"] = resp.text.strip()
-            except Exception:
-                pass
-        out.append(row)
-
-    payload = {
-        "symptoms_with_ai": out,
-        "meta": {
-            "lookback_days": days,
-            "disclaimer": disclaimer,
-        },
+        })
+        if use_ai and model and len(prompts) < _AI_SUGGESTION_LIMIT:
+            prompts.append(
+                "你是一名健康生活建议助手。\n"
+                f"孕期分期 {tri}，症状：{s.symptom}，严重程度 {s.severity}/5。\n"
+                + lab_context
+                + f"最近 3 天 Gluten Snap 结果：{gluten_events}。\n"
+                "请用简洁、温和、无医疗处方的语言，提供 1-2 条生活建议；避免诊断和药物建议。\n"
+                "在结尾加“仅供参考，不构成医疗建议，请遵医嘱”。"
+            )
+
+    def _suggest(prompt: str) -> str | None:
+        try:
+            return _cached_suggestion(api_key, prompt)
+        except Exception:
+            return None
+
+    def _rows():
+        if not prompts:
+            yield from out
+            return
+        # Symptoms are newest first, so prompts line up with the head of `out`.
+        # Repeated prompts (same symptom and severity) share one call.
+        unique = list(dict.fromkeys(prompts))
+        with ThreadPoolExecutor(max_workers=min(_AI_MAX_WORKERS, len(unique))) as ex:
+            futures = {prompt: ex.submit(_suggest, prompt) for prompt in unique}
+            for row, prompt in zip(out, prompts):
+                row["ai_suggestion"] = futures[prompt].result()
+                yield row
+        yield from out[len(prompts):]
+
+    meta = {
+        "lookback_days": days,
+        "disclaimer": disclaimer,
     }
-    return jsonify(payload)
+
+    def _stream():
+        # Same shape as {"symptoms_with_ai": [...], "meta": {...}}, but each
+        # row is flushed as soon as its suggestion is ready.
+        dumps = current_app.json.dumps
+        yield '{"symptoms_with_ai":['
+        for i, row in enumerate(_rows()):
+            yield ("," if i else "") + dumps(row)
+        yield '],"meta":' + dumps(meta) + "}"
+
+    return Response(stream_with_context(_stream()), mimetype="application/json")
 
 
 @bp.route('/exports/seed_correlation_demo', methods=['POST'])
@@ -140,18 +176,31 @@ def seed_correlation_demo() -> Any:
     today = datetime.utcnow().date()
 
     def d(n: int) -> date:
-        from datetime import timedelta
         return today - timedelta(days=n)
 
     variant = (request.args.get('variant') or 'basic').lower().strip()
 
+    # Everything seeded falls within the last 21 days. Existing labs and
+    # scan days in that window are fetched once up front, and new rows are
+    # collected and bulk-inserted with a single commit at the end.
+    window_start = d(21)
+    new_rows: list = []
+
     # Labs
     created_labs = 0
+    existing_labs = {
+        tuple(r)
+        for r in db.session.query(Lab.test_name, Lab.test_date, Lab.result)
+        .filter(Lab.user_id == user.id, Lab.test_date >= window_start)
+        .all()
+    }
     def add_lab(days_ago: int, name: str, value: float, unit: str):
         nonlocal created_labs
-        exists = Lab.query.filter_by(user_id=user.id, test_name=name, test_date=d(days_ago), result=str(value)).first()
-        if not exists:
-            db.session.add(Lab(user_id=user.id, test_name=name, result=str(value), units=unit, test_date=d(days_ago)))
+        day, result = d(days_ago), str(value)
+        key = (name, day, result)
+        if key not in existing_labs:
+            existing_labs.add(key)
+            new_rows.append(Lab(user_id=user.id, test_name=name, result=result, units=unit, test_date=day))
             created_labs += 1
 
     if variant == 'rich':
@@ -181,7 +230,7 @@ def seed_correlation_demo() -> Any:
     def add_sym(days_ago: int, name: str, sev: int, note: str | None, hour: int = 9):
         nonlocal created_syms
         ts = datetime.combine(d(days_ago), time(hour=hour))
-        db.session.add(Symptom(user_id=user.id, symptom=name, severity=sev, note=note, logged_at=ts))
+        new_rows.append(Symptom(user_id=user.id, symptom=name, severity=sev, note=note, logged_at=ts))
         created_syms += 1
 
     if variant == 'rich':
@@ -200,15 +249,21 @@ def seed_correlation_demo() -> Any:
 
     # Gluten suspect
     created_gluten = 0
+    scan_days = {
+        created_at.date()
+        for (created_at,) in db.session.query(GlutenScan.created_at)
+        .filter(
+            GlutenScan.user_id == user.id,
+            GlutenScan.created_at >= datetime.combine(window_start, time.min),
+        )
+        .all()
+    }
     def add_gluten(days_ago: int, tag: str = 'gluten_likely', hour: int = 12):
         nonlocal created_gluten
-        gs = GlutenScan.query.filter(
-            GlutenScan.user_id == user.id,
-            GlutenScan.created_at >= datetime.combine(d(days_ago), datetime.min.time()),
-            GlutenScan.created_at <= datetime.combine(d(days_ago), datetime.max.time()),
-        ).first()
-        if not gs:
-            db.session.add(GlutenScan(user_id=user.id, image_url='<seed>', result_tag=tag, created_at=datetime.combine(d(days_ago), time(hour=hour))))
+        day = d(days_ago)
+        if day not in scan_days:
+            scan_days.add(day)
+            new_rows.append(GlutenScan(user_id=user.id, image_url='<seed>', result_tag=tag, created_at=datetime.combine(day, time(hour=hour))))
             created_gluten += 1
 
     if variant == 'rich':
@@ -217,6 +272,10 @@ def seed_correlation_demo() -> Any:
     else:
         add_gluten(2)
 
+    db.session.bulk_save_objects(new_rows)
+    if new_rows:
+        # Bulk saves skip flush events, so bump the list ETag revision here
+        bump_revision(db.session, user.id)
     db.session.commit()
     return jsonify({"status": "ok", "variant": variant, "labs_seeded": created_labs, "symptoms_seeded": created_syms, "gluten_seeded": created_gluten})
 
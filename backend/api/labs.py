@@ -1,15 +1,54 @@
 from __future__ import annotations
-from typing import Any
+import time
+from typing import Any, NamedTuple
 
-from flask import Blueprint, jsonify, request
-from .utils import current_user
-from models import db, Lab, Profile, ReferenceRange
+from flask import Blueprint, g, jsonify, request
+from .utils import current_user, current_user_id
+from models import db, Lab, Profile, ReferenceRange, User
+from pydantic import TypeAdapter
 from schemas import LabIn
 from datetime import date
 from utils.gestation import calculate_by_lmp, calculate_by_due
 
 bp = Blueprint("labs", __name__)
 
+_LAB_ADAPTER = TypeAdapter(LabIn)
+
+
+class _RefRange(NamedTuple):
+    low: float
+    high: float
+    unit: str
+
+
+# Seconds a worker serves reference ranges before re-reading the table, so
+# edits (e.g. re-running seed_reference_ranges.py) reach every process
+_REF_TTL = 300.0
+_ref_cache: tuple[float, dict[tuple[str, str], _RefRange]] | None = None
+
+
+def _ref_map() -> dict[tuple[str, str], _RefRange]:
+    global _ref_cache
+    now = time.monotonic()
+    if _ref_cache is None or now - _ref_cache[0] > _REF_TTL:
+        # Plain tuples so cached entries never hang on to a (detached) session
+        ranges = {
+            (rr.analyte, rr.trimester): _RefRange(rr.low, rr.high, rr.unit)
+            for rr in ReferenceRange.query.all()
+        }
+        # Not seeded yet; look again on the next call instead of caching nothing
+        _ref_cache = (now, ranges) if ranges else None
+        return ranges
+    return _ref_cache[1]
+
+
+def _ref_range(analyte: str, trimester: str | None) -> _RefRange | None:
+    """Reference range for an analyte in a trimester, from the process cache."""
+    if trimester not in {"T1", "T2", "T3"}:
+        return None
+    return _ref_map().get((analyte.upper(), trimester))
+
+
 def _u(): return current_user()
 
 @bp.before_request
@@ -24,50 +63,33 @@ def _auth():
 def list_labs() -> Any:
     # Return labs with status, delta and trimester fields
     user = _u()
-    labs = Lab.query.filter_by(user_id=user.id).order_by(Lab.test_date.asc(), Lab.id.asc()).all()
-    prof = Profile.query.filter_by(user_id=user.id).first()
-    tri = _current_trimester(prof)
-    result = []
-    for lab in labs:
-        enr = lab.to_dict()
-        # Attach trimester-specific reference range if available
-        rr = None
-        if tri and tri in {"T1", "T2", "T3"}:
-            rr = ReferenceRange.query.filter_by(analyte=lab.test_name.upper(), trimester=tri).first()
-        enr.update({
-            "trimester": tri or "-",
-            "status": _status_for_lab(lab, tri),
-            "delta": _delta_for_lab(user.id, lab),
-            "ref_low": rr.low if rr else None,
-            "ref_high": rr.high if rr else None,
-            "ref_unit": rr.unit if rr else None,
-        })
-        result.append(enr)
-    return jsonify(result)
+    tri = _request_trimester(user)
+    # Previous result of the same test comes back alongside each lab
+    prev_result = db.func.lag(Lab.result).over(
+        partition_by=Lab.test_name, order_by=(Lab.test_date.asc(), Lab.id.asc())
+    )
+    rows = (
+        db.session.query(Lab, prev_result)
+        .filter(Lab.user_id == user.id)
+        .order_by(Lab.test_date.asc(), Lab.id.asc())
+        .all()
+    )
+    return jsonify([_enriched(lab, tri, _pct_delta(lab.result, prev)) for lab, prev in rows])
 
 @bp.route("/labs", methods=["POST"])
 def create_lab() -> Any:
     try:
-        payload = LabIn.model_validate(request.get_json())
+        payload = _LAB_ADAPTER.validate_json(request.get_data(cache=False))
     except Exception as e:
         return jsonify(error=str(e)), 400
 
-    lab = Lab(user_id=_u().id, **payload.model_dump())
+    # Read what we need from the cached user before the commit expires it
+    user = _u()
+    user_id = user.id
+    tri = _request_trimester(user)
+    lab = Lab(user_id=user_id, **payload.model_dump())
     db.session.add(lab); db.session.commit()
-    prof = Profile.query.filter_by(user_id=_u().id).first()
-    tri = _current_trimester(prof)
-    data = lab.to_dict()
-    rr = None
-    if tri and tri in {"T1", "T2", "T3"}:
-        rr = ReferenceRange.query.filter_by(analyte=lab.test_name.upper(), trimester=tri).first()
-    data.update({
-        "trimester": tri or "-",
-        "status": _status_for_lab(lab, tri),
-        "delta": _delta_for_lab(_u().id, lab),
-        "ref_low": rr.low if rr else None,
-        "ref_high": rr.high if rr else None,
-        "ref_unit": rr.unit if rr else None,
-    })
+    data = _enriched(lab, tri, _delta_for_lab(user_id, lab))
     return jsonify(data), 201
 
 
@@ -77,26 +99,13 @@ def get_lab(lab_id: int) -> Any:
     lab = Lab.query.filter_by(user_id=user.id, id=lab_id).first()
     if not lab:
         return jsonify(error="Not found"), 404
-    prof = Profile.query.filter_by(user_id=user.id).first()
-    tri = _current_trimester(prof)
-    data = lab.to_dict()
-    rr = None
-    if tri and tri in {"T1", "T2", "T3"}:
-        rr = ReferenceRange.query.filter_by(analyte=lab.test_name.upper(), trimester=tri).first()
-    data.update({
-        "trimester": tri or "-",
-        "status": _status_for_lab(lab, tri),
-        "delta": _delta_for_lab(user.id, lab),
-        "ref_low": rr.low if rr else None,
-        "ref_high": rr.high if rr else None,
-        "ref_unit": rr.unit if rr else None,
-    })
+    tri = _request_trimester(user)
+    data = _enriched(lab, tri, _delta_for_lab(user.id, lab))
     return jsonify(data)
 
 @bp.route("/labs/<int:lab_id>", methods=["DELETE"])
 def delete_lab(lab_id: int) -> Any:
-    user = _u()
-    lab = Lab.query.filter_by(user_id=user.id, id=lab_id).first()
+    lab = Lab.query.filter_by(user_id=current_user_id(), id=lab_id).first()
     if not lab:
         return jsonify(error="Not found"), 404
     db.session.delete(lab)
@@ -117,14 +126,34 @@ def _current_trimester(profile: Profile | None) -> str | None:
     return None
 
 
-def _status_for_lab(lab: Lab, trimester: str | None) -> str:
+def _request_trimester(user: User) -> str | None:
+    # One gestation calculation per request; the profile comes preloaded
+    # with the user (see current_user)
+    if "trimester" not in g:
+        g.trimester = _current_trimester(user.profile)
+    return g.trimester
+
+
+def _enriched(lab: Lab, trimester: str | None, delta: float | None) -> dict:
+    """Serialize a lab with its trimester, reference range, status and delta."""
+    data = lab.to_dict()
+    rr = _ref_range(lab.test_name, trimester)
+    data.update({
+        "trimester": trimester or "-",
+        "status": _status_for_lab(lab, rr),
+        "delta": delta,
+        "ref_low": rr.low if rr else None,
+        "ref_high": rr.high if rr else None,
+        "ref_unit": rr.unit if rr else None,
+    })
+    return data
+
+
+def _status_for_lab(lab: Lab, rr: _RefRange | None) -> str:
     try:
         value = float(lab.result)
     except Exception:
         return "NA"
-    if not trimester or trimester not in {"T1", "T2", "T3"}:
-        return "NA"
-    rr = ReferenceRange.query.filter_by(analyte=lab.test_name.upper(), trimester=trimester).first()
     if not rr:
         return "NA"
     if value < rr.low:
@@ -134,13 +163,24 @@ def _status_for_lab(lab: Lab, trimester: str | None) -> str:
     return "NORMAL"
 
 
-def _delta_for_lab(user_id: int, lab: Lab) -> float | None:
+def _pct_delta(curr_result: str, prev_result: str | None) -> float | None:
+    if prev_result is None:
+        return None
     try:
-        curr = float(lab.result)
+        curr = float(curr_result)
+        prev_val = float(prev_result)
     except Exception:
         return None
+    if prev_val == 0:
+        return None
+    pct = ((curr - prev_val) / prev_val) * 100.0
+    return round(pct, 1)
+
+
+def _delta_for_lab(user_id: int, lab: Lab) -> float | None:
     prev = (
-        Lab.query.filter(
+        db.session.query(Lab.result)
+        .filter(
             Lab.user_id == user_id,
             Lab.test_name == lab.test_name,
             (Lab.test_date < lab.test_date) | ((Lab.test_date == lab.test_date) & (Lab.id < lab.id)),
@@ -148,13 +188,4 @@ def _delta_for_lab(user_id: int, lab: Lab) -> float | None:
         .order_by(Lab.test_date.desc(), Lab.id.desc())
         .first()
     )
-    if not prev:
-        return None
-    try:
-        prev_val = float(prev.result)
-    except Exception:
-        return None
-    if prev_val == 0:
-        return None
-    pct = ((curr - prev_val) / prev_val) * 100.0
-    return round(pct, 1)
+    return _pct_delta(lab.result, prev.result if prev else None)
@@ -2,13 +2,17 @@ from __future__ import annotations
 from typing import Any
 
 from flask import Blueprint, jsonify, request
-from .utils import current_user
+from .utils import current_user, current_user_id, not_modified, revision_etag, with_etag
 from models import db, Medication
+from pydantic import TypeAdapter
 from schemas import MedicationIn
 from datetime import datetime
 
 bp = Blueprint("medications", __name__)
 
+# Built once; validate_json parses and validates the raw body in one pass
+_MED_ADAPTER = TypeAdapter(MedicationIn)
+
 def _u(): return current_user()
 
 @bp.before_request
@@ -21,12 +25,22 @@ def _auth():
 
 @bp.route("/medications", methods=["GET"])
 def list_medications() -> Any:
-    return jsonify([m.to_dict() for m in _u().medications])
+    user_id = current_user_id()
+    etag = revision_etag(user_id)
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
+    meds = (
+        Medication.query.filter_by(user_id=user_id)
+        .order_by(Medication.taken_at.desc(), Medication.id.desc())
+        .all()
+    )
+    return with_etag(jsonify([m.to_dict() for m in meds]), etag)
 
 @bp.route("/medications", methods=["POST"])
 def create_medication() -> Any:
     try:
-        payload = MedicationIn.model_validate(request.get_json())
+        payload = _MED_ADAPTER.validate_json(request.get_data(cache=False))
     except Exception as e:
         return jsonify(error=str(e)), 400
 
@@ -34,6 +48,6 @@ def create_medication() -> Any:
     if data["taken_at"] is None:
         data["taken_at"] = datetime.utcnow()
 
-    med = Medication(user_id=_u().id, **data)
+    med = Medication(user_id=current_user_id(), **data)
     db.session.add(med); db.session.commit()
     return jsonify(med.to_dict()), 201
@@ -1,15 +1,19 @@
 from __future__ import annotations
 
-from datetime import date, timedelta
+from datetime import date
 from typing import Any
 
 from flask import Blueprint, jsonify, request
-from .utils import current_user
+from .utils import body_etag, current_user, not_modified, with_etag
 from models import db, Profile
+from pydantic import TypeAdapter
 from schemas import ProfileIn, ProfileOut
+from utils.gestation import calculate_by_due, calculate_by_lmp
 
 bp = Blueprint("profile", __name__)
 
+_PROFILE_ADAPTER = TypeAdapter(ProfileIn)
+
 
 def _u():
     return current_user()
@@ -24,25 +28,6 @@ def _auth():
         return jsonify(error="Unauthorized"), 401
 
 
-def _calc_by_lmp(lmp: date, today: date) -> tuple[int | None, str]:
-    days = (today - lmp).days
-    if days < 0:
-        return None, "-"
-    weeks = days // 7
-    if weeks <= 12:
-        tri = "T1"
-    elif weeks <= 27:
-        tri = "T2"
-    else:
-        tri = "T3"
-    return weeks, tri
-
-
-def _calc_by_due(edd: date, today: date) -> tuple[int | None, str]:
-    lmp = edd - timedelta(days=280)
-    return _calc_by_lmp(lmp, today)
-
-
 def _to_out(profile: Profile | None) -> dict:
     if not profile:
         return ProfileOut(
@@ -54,38 +39,44 @@ def _to_out(profile: Profile | None) -> dict:
         ).model_dump()
 
     today = date.today()
-    weeks: int | None = None
-    tri: str = "-"
+    ga = {"weeks": None, "trimester": "-"}
     if profile.lmp_date:
-        weeks, tri = _calc_by_lmp(profile.lmp_date, today)
+        ga = calculate_by_lmp(profile.lmp_date, today)
     elif profile.due_date:
-        weeks, tri = _calc_by_due(profile.due_date, today)
+        ga = calculate_by_due(profile.due_date, today)
 
     return ProfileOut(
         lmp_date=profile.lmp_date,
         due_date=profile.due_date,
         high_risk_notes=profile.high_risk_notes or "",
-        gestational_age_weeks=weeks,
-        trimester=tri,
+        gestational_age_weeks=ga["weeks"],
+        trimester=ga["trimester"],
     ).model_dump()
 
 
 @bp.route("/profile", methods=["GET"])
 def get_profile() -> Any:
-    prof = Profile.query.filter_by(user_id=_u().id).first()
-    return jsonify(_to_out(prof))
+    # The profile is already loaded with the user, so hash the body itself;
+    # it also changes when the gestational week rolls over.
+    resp = jsonify(_to_out(_u().profile))
+    etag = body_etag(resp)
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
+    return with_etag(resp, etag)
 
 
 @bp.route("/profile", methods=["PUT"])
 def upsert_profile() -> Any:
     try:
-        payload = ProfileIn.model_validate(request.get_json())
+        payload = _PROFILE_ADAPTER.validate_json(request.get_data(cache=False))
     except Exception as e:
         return jsonify(error=str(e)), 400
 
-    prof = Profile.query.filter_by(user_id=_u().id).first()
+    user = _u()
+    prof = user.profile
     if not prof:
-        prof = Profile(user_id=_u().id)
+        prof = Profile(user_id=user.id)
         db.session.add(prof)
 
     data = payload.model_dump()
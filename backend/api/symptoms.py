@@ -1,15 +1,26 @@
 from __future__ import annotations
+from bisect import bisect_right
+from itertools import groupby
+from operator import itemgetter
 from typing import Any
 
 from flask import Blueprint, jsonify, request
-from .utils import current_user
-from models import db, Symptom, Lab, GlutenScan, Profile
+from .utils import current_user, current_user_id, not_modified, ranked_labs, revision_etag, with_etag
+from models import db, Symptom, Lab, GlutenScan
+from pydantic import TypeAdapter
 from schemas import SymptomIn
-from datetime import datetime, date, timedelta
+from datetime import datetime, date, time, timedelta
 from sqlalchemy import and_
+from sqlalchemy.orm import raiseload
+from utils.gemini import get_model
 
 bp = Blueprint("symptoms", __name__)
 
+_SYMPTOM_ADAPTER = TypeAdapter(SymptomIn)
+
+# Midnight; day windows are half-open [day 00:00, next day 00:00)
+DAY_START = time.min
+
 def _u(): return current_user()
 
 @bp.before_request
@@ -24,7 +35,13 @@ def _auth():
 def list_symptoms() -> Any:
     # Optional filters: start_date, end_date, symptom_name
     user = _u()
-    q = Symptom.query.filter_by(user_id=user.id)
+    # Revision covers the labs and gluten scans merged into each row too
+    etag = revision_etag(user.id)
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
+    # raiseload: to_dict() must not lazily pull in relationships per row
+    q = Symptom.query.options(raiseload("*")).filter_by(user_id=user.id)
     start_date_str = request.args.get("start_date")
     end_date_str = request.args.get("end_date")
     name = request.args.get("symptom_name")
@@ -44,68 +61,80 @@ def list_symptoms() -> Any:
             pass
     q = q.order_by(Symptom.logged_at.desc(), Symptom.id.desc())
 
-    items = []
-    for s in q.all():
-        d = s.to_dict()
-        # related lab event: last lab at or before date with TSH/FT4 summary
-        d_date = s.logged_at.date()
-        last_tsh = (
-            Lab.query.filter(
-                Lab.user_id == user.id,
-                Lab.test_name.in_(["TSH", "tsh", "Tsh"]),
-                Lab.test_date <= d_date,
-            )
-            .order_by(Lab.test_date.desc(), Lab.id.desc())
-            .first()
-        )
-        last_ft4 = (
-            Lab.query.filter(
-                Lab.user_id == user.id,
-                Lab.test_name.in_(["FT4", "ft4", "Ft4"]),
-                Lab.test_date <= d_date,
-            )
-            .order_by(Lab.test_date.desc(), Lab.id.desc())
-            .first()
+    symptoms = q.all()
+    if not symptoms:
+        return with_etag(jsonify([]), etag)
+    days = [s.logged_at.date() for s in symptoms]
+    first_day, last_day = min(days), max(days)
+
+    # All TSH/FT4 labs up to the newest symptom, oldest first; the last lab
+    # on or before a given day is then a bisect away.
+    analyte = db.func.upper(Lab.test_name)
+    lab_rows = (
+        db.session.query(analyte.label("analyte"), Lab.test_date, Lab.result, Lab.units)
+        .filter(Lab.user_id == user.id, analyte.in_(["TSH", "FT4"]), Lab.test_date <= last_day)
+        .order_by(Lab.test_date.asc(), Lab.id.asc())
+        .all()
+    )
+    tsh_labs = [r for r in lab_rows if r.analyte == "TSH"]
+    ft4_labs = [r for r in lab_rows if r.analyte == "FT4"]
+    tsh_dates = [r.test_date for r in tsh_labs]
+    ft4_dates = [r.test_date for r in ft4_labs]
+    tsh_text = [f"TSH={r.result} {r.units}" if r.units else f"TSH={r.result}" for r in tsh_labs]
+    ft4_text = [f"FT4={r.result} {r.units}" if r.units else f"FT4={r.result}" for r in ft4_labs]
+    # related_lab_event per (TSH index, FT4 index); most rows share a pair
+    lab_events: dict = {}
+
+    # Days with at least one gluten scan across the covered range
+    scan_days = {
+        created_at.date()
+        for (created_at,) in db.session.query(GlutenScan.created_at)
+        .filter(
+            GlutenScan.user_id == user.id,
+            GlutenScan.created_at >= datetime.combine(first_day, DAY_START),
+            GlutenScan.created_at < datetime.combine(last_day + timedelta(days=1), DAY_START),
         )
-        if last_tsh or last_ft4:
-            lab_date = None
-            if last_tsh and last_ft4:
-                lab_date = max(last_tsh.test_date, last_ft4.test_date)
-            elif last_tsh:
-                lab_date = last_tsh.test_date
-            else:
-                lab_date = last_ft4.test_date
-            summary_parts = []
-            if last_tsh:
-                summary_parts.append(f"TSH={last_tsh.result}{' ' + (last_tsh.units or '')}")
-            if last_ft4:
-                summary_parts.append(f"FT4={last_ft4.result}{' ' + (last_ft4.units or '')}")
-            d["related_lab_event"] = {
-                "date": lab_date.isoformat() if lab_date else None,
-                "summary": ", ".join(summary_parts),
-            }
-        else:
-            d["related_lab_event"] = None
+        .all()
+    }
 
+    # Rows come newest-first, so each day's symptoms are contiguous: resolve
+    # the related lab and gluten events once per day and share them.
+    items = []
+    for d_date, group in groupby(zip(symptoms, days), key=itemgetter(1)):
+        # related lab event: last lab at or before date with TSH/FT4 summary
+        i_tsh = bisect_right(tsh_dates, d_date) - 1
+        i_ft4 = bisect_right(ft4_dates, d_date) - 1
+        key = (i_tsh, i_ft4)
+        if key not in lab_events:
+            tsh = (tsh_dates[i_tsh], tsh_text[i_tsh]) if i_tsh >= 0 else None
+            ft4 = (ft4_dates[i_ft4], ft4_text[i_ft4]) if i_ft4 >= 0 else None
+            lab_events[key] = _lab_event(tsh, ft4)
+        lab_event = lab_events[key]
         # related gluten event: any scan that day
-        gs = (
-            GlutenScan.query.filter(
-                GlutenScan.user_id == user.id,
-                GlutenScan.created_at >= datetime.combine(d_date, datetime.min.time()),
-                GlutenScan.created_at <= datetime.combine(d_date, datetime.max.time()),
-            )
-            .order_by(GlutenScan.created_at.desc())
-            .first()
-        )
-        d["related_gluten_event"] = bool(gs)
-        items.append(d)
-
-    return jsonify(items)
+        gluten_event = d_date in scan_days
+
+        for s, _ in group:
+            d = s.to_dict()
+            d["related_lab_event"] = lab_event
+            d["related_gluten_event"] = gluten_event
+            items.append(d)
+
+    return with_etag(jsonify(items), etag)
+
+def _lab_event(*labs: tuple[date, str] | None) -> dict | None:
+    # Each lab is (test_date, "NAME=result units") or None when missing
+    present = [lab for lab in labs if lab]
+    if not present:
+        return None
+    return {
+        "date": max(d for d, _ in present).isoformat(),
+        "summary": ", ".join(text for _, text in present),
+    }
 
 @bp.route("/symptoms", methods=["POST"])
 def create_symptom() -> Any:
     try:
-        payload = SymptomIn.model_validate(request.get_json())
+        payload = _SYMPTOM_ADAPTER.validate_json(request.get_data(cache=False))
     except Exception as e:
         return jsonify(error=str(e)), 400
 
@@ -113,14 +142,13 @@ def create_symptom() -> Any:
     if data["logged_at"] is None:
         data["logged_at"] = datetime.utcnow()
 
-    sym = Symptom(user_id=_u().id, **data)
+    sym = Symptom(user_id=current_user_id(), **data)
     db.session.add(sym); db.session.commit()
     return jsonify(sym.to_dict()), 201
 
 @bp.route("/symptoms/<int:symptom_id>", methods=["DELETE"])
 def delete_symptom(symptom_id: int) -> Any:
-    user = _u()
-    sym = Symptom.query.filter_by(id=symptom_id, user_id=user.id).first()
+    sym = Symptom.query.filter_by(id=symptom_id, user_id=current_user_id()).first()
     if not sym:
         return jsonify(error="Not found"), 404
     db.session.delete(sym)
@@ -136,9 +164,20 @@ def symptom_ai_suggestion() -> Any:
     if not symptom_name or severity is None:
         return jsonify(error="symptom and severity are required"), 400
 
+    # Bail out before any DB work when Gemini isn't configured
+    from config import Config
+    api_key = Config.GEMINI_API_KEY
+    disclaimer = "仅供参考，不构成医疗建议，请遵医嘱"
+    if not api_key:
+        return jsonify({
+            "suggestion": None,
+            "disclaimer": disclaimer,
+            "note": "Gemini API key missing; returning no suggestion"
+        })
+
     # Build context
     user = _u()
-    prof = Profile.query.filter_by(user_id=user.id).first()
+    prof = user.profile
     tri = "-"
     weeks = None
     if prof:
@@ -154,40 +193,34 @@ def symptom_ai_suggestion() -> Any:
             tri = r.get("trimester", "-")  # type: ignore
             weeks = r.get("weeks")  # type: ignore
 
-    last_tsh = (
-        Lab.query.filter(Lab.user_id == user.id, Lab.test_name.in_(["TSH", "tsh", "Tsh"]))
-        .order_by(Lab.test_date.desc(), Lab.id.desc())
-        .first()
-    )
-    last_ft4 = (
-        Lab.query.filter(Lab.user_id == user.id, Lab.test_name.in_(["FT4", "ft4", "Ft4"]))
-        .order_by(Lab.test_date.desc(), Lab.id.desc())
-        .first()
-    )
-    # last 3 days gluten events
+    # Latest TSH/FT4 and the last-3-days gluten count in one round trip:
+    # the one-row count is left-joined to the latest lab per analyte.
     today = datetime.utcnow().date()
-    gs_count = (
-        GlutenScan.query.filter(
+    gluten = (
+        db.session.query(db.func.count(GlutenScan.id).label("n"))
+        .filter(
             GlutenScan.user_id == user.id,
-            GlutenScan.created_at >= datetime.combine(today - timedelta(days=3), datetime.min.time()),
-        ).count()
+            GlutenScan.created_at >= datetime.combine(today - timedelta(days=3), DAY_START),
+            GlutenScan.created_at < datetime.combine(today + timedelta(days=1), DAY_START),
+        )
+        .subquery()
     )
+    ranked = ranked_labs(user.id, "TSH", "FT4")
+    rows = (
+        db.session.query(gluten.c.n, ranked.c.analyte, ranked.c.test_date, ranked.c.result)
+        .select_from(gluten)
+        .outerjoin(ranked, ranked.c.rn == 1)
+        .all()
+    )
+    gs_count = rows[0].n
+    labs = {r.analyte: r for r in rows if r.analyte}
+    last_tsh = labs.get("TSH")
+    last_ft4 = labs.get("FT4")
     gluten_events = f"{gs_count} scan(s) in last 3 days"
 
-    # Generate with Gemini if available
-    from config import Config
-    api_key = Config.GEMINI_API_KEY
-    disclaimer = "仅供参考，不构成医疗建议，请遵医嘱"
-    if not api_key:
-        return jsonify({
-            "suggestion": None,
-            "disclaimer": disclaimer,
-            "note": "Gemini API key missing; returning no suggestion"
-        })
+    # Generate with Gemini
     try:
-        import google.generativeai as genai
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-2.0-flash')
+        model = get_model(api_key)
         prompt = (
             "你是一名健康生活建议助手。\n"
             f"已知用户怀孕 {weeks or '未知'} 周（孕期分期 {tri}），记录症状：{symptom_name}，严重程度 {severity}/5。\n"
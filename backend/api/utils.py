@@ -1,9 +1,86 @@
 """Shared helpers."""
 
-from typing import Optional
-from flask import session
-from models import User
+import hashlib
+from typing import Any, Dict, Optional
+from flask import Response, current_app, g, request, session
+from sqlalchemy.orm import joinedload, load_only
+from models import db, Lab, User, UserRevision
 
 def current_user() -> Optional[User]:
-    uid = session.get("user_id")
-    return User.query.get(uid) if uid else None
+    # Cached on `g` so _auth and the handler share a single SELECT; the
+    # profile is joined in since most handlers need the trimester, and only
+    # the user columns handlers actually read are loaded.
+    if "user" not in g:
+        uid = session.get("user_id")
+        g.user = (
+            User.query.options(load_only(User.id, User.nickname), joinedload(User.profile)).get(uid)
+            if uid
+            else None
+        )
+    return g.user
+
+
+def current_user_id() -> Optional[int]:
+    # For handlers that only need the id; the blueprint's _auth hook has
+    # already checked that the session user exists.
+    return session.get("user_id")
+
+
+def revision_etag(user_id: int) -> str:
+    """ETag for a user's list data, scoped to the request's query string."""
+    rev = db.session.query(UserRevision.rev).filter_by(user_id=user_id).scalar() or 0
+    key = f"{user_id}:{rev}:{request.query_string.decode()}"
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def body_etag(resp: Response) -> str:
+    return hashlib.sha1(resp.get_data()).hexdigest()
+
+
+def not_modified(etag: str) -> Optional[Response]:
+    """A 304 response if the client already holds ``etag``, else None."""
+    if etag not in request.if_none_match:
+        return None
+    return with_etag(current_app.response_class(status=304), etag)
+
+
+def with_etag(resp: Response, etag: str) -> Response:
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "private, max-age=0, must-revalidate"
+    return resp
+
+
+def ranked_labs(user_id: int, *analytes: str) -> Any:
+    """Subquery of a user's labs for ``analytes``, numbered newest-first per analyte.
+
+    Columns are ``analyte`` (upper-cased name), ``id``, ``test_date``,
+    ``result``, ``units`` and ``rn``; ``rn == 1`` is the latest row.
+    """
+    name = db.func.upper(Lab.test_name)
+    q = db.session.query(
+        name.label("analyte"),
+        Lab.id,
+        Lab.test_date,
+        Lab.result,
+        Lab.units,
+        db.func.row_number()
+        .over(partition_by=name, order_by=(Lab.test_date.desc(), Lab.id.desc()))
+        .label("rn"),
+    ).filter(Lab.user_id == user_id, name.in_([a.upper() for a in analytes]))
+    return q.subquery()
+
+
+def latest_labs(user_id: int, *analytes: str) -> Dict[str, Any]:
+    """Most recent lab row per analyte, fetched in a single query.
+
+    Analytes are matched case-insensitively and the result is keyed by the
+    upper-cased name; analytes with no lab are left out. Rows expose
+    ``id``, ``test_date``, ``result`` and ``units``.
+    """
+    ranked = ranked_labs(user_id, *analytes)
+    rows = (
+        db.session.query(ranked.c.analyte, ranked.c.id, ranked.c.test_date, ranked.c.result, ranked.c.units)
+        .filter(ranked.c.rn == 1)
+        .all()
+    )
+    return {row.analyte: row for row in rows}
@@ -4,23 +4,20 @@ from __future__ import annotations
 from flask import Flask
 from flask_cors import CORS
 from models import db
-from tasks import init_scheduler, generate_initial_messages
+from tasks import init_scheduler
 from api import api_bp  # API Blueprint
 from config import Config
+from utils.orjson_provider import OrjsonProvider
+from utils.gemini import get_model
 
-import logging, pathlib, os
+import logging
 
 def create_app() -> Flask:
     app = Flask(__name__)
+    app.json = OrjsonProvider(app)
     
-    # Load configuration from config.py
+    # Load configuration from config.py (database URI, secret key, etc.)
     app.config.from_object(Config)
-    
-    # Configuration: use SQLite for local development.
-    db_path = os.path.join(os.path.dirname(__file__), "hashimom.db")
-    app.config.setdefault("SQLALCHEMY_DATABASE_URI", f"sqlite:///{db_path}")
-    app.config.setdefault("SQLALCHEMY_TRACK_MODIFICATIONS", False)
-    app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", "development-secret-key-12345")
 
     # 日志
     logging.basicConfig(
@@ -43,11 +40,18 @@ def create_app() -> Flask:
         ]
     CORS(app, origins=allow_origins, supports_credentials=True)
 
+    # Build the shared Gemini client up front so a broken SDK/key shows up
+    # in the boot log rather than on the first AI request.
+    if app.config.get("GEMINI_API_KEY"):
+        try:
+            get_model(app.config["GEMINI_API_KEY"])
+        except Exception as e:
+            logging.warning(f"Gemini client init failed: {e}")
+
     db.init_app(app)
-    with app.app_context():
-        db.create_all()
-        # Generate initial AI messages for existing users
-        generate_initial_messages(app)
+    if app.config.get("AUTO_CREATE_TABLES"):
+        with app.app_context():
+            db.create_all()
 
     # Register aggregated API blueprint once at /api
     app.register_blueprint(api_bp)
@@ -19,8 +19,26 @@ class Config:
     # Render/Heroku 可能提供 postgres:// 前缀，统一替换为 SQLAlchemy 认可的 postgresql://
     if _raw_db_uri.startswith("postgres://"):
         _raw_db_uri = _raw_db_uri.replace("postgres://", "postgresql://", 1)
+    # 未指定驱动时使用 psycopg 3（C 加速的协议解析）
+    if _raw_db_uri.startswith("postgresql://"):
+        _raw_db_uri = _raw_db_uri.replace("postgresql://", "postgresql+psycopg://", 1)
     SQLALCHEMY_DATABASE_URI = _raw_db_uri
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # 连接池（仅服务端数据库；SQLite 沿用默认池）。不做 pre-ping，避免每次
+    # 取连接多一次往返；失效连接靠 pool_recycle 定期回收
+    # SQLite 允许跨线程使用连接（调度器线程与请求线程共享连接池）
+    SQLALCHEMY_ENGINE_OPTIONS = (
+        {"connect_args": {"check_same_thread": False}}
+        if _raw_db_uri.startswith("sqlite")
+        else {
+            "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+            "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+            "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+            "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "False").lower() == "true",
+        }
+    )
+    # 启动时自动建表；项目暂无迁移工具，默认开启，生产环境可设为 False 跳过
+    AUTO_CREATE_TABLES = os.getenv("AUTO_CREATE_TABLES", "True").lower() == "true"
     SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-key-12345")
 
     # Third‑party keys
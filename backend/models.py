@@ -9,6 +9,8 @@ architecture. Each table corresponds to a core feature in the MVP:
 * Medication – logs medication name, dose and timing.  
 * GlutenScan – stores the outcome of an image scan for gluten content.  
 * AIMessage – persists encouraging messages generated by AI.
+* UserRevision – per-user counter bumped on every data change, used for ETags.
+* SchedulerRun – one row per (job, day) so a scheduled job runs in one process only.
 
 All datetime fields use naive UTC timestamps via `datetime.utcnow()`.  
 This avoids storing personally identifiable information (PHI) and keeps
@@ -17,15 +19,31 @@ the data model straightforward.
 
 from __future__ import annotations
 
+import sqlite3
 from datetime import datetime, date
 from typing import Optional
 
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
 
 
 db = SQLAlchemy()
 
 
+@event.listens_for(Engine, "connect")
+def _sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """Use WAL on SQLite so reads don't block behind the writer."""
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cur = dbapi_connection.cursor()
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("PRAGMA synchronous=NORMAL")
+        cur.close()
+
+
 class User(db.Model):
     """Simple user model using a nickname.
 
@@ -39,12 +57,12 @@ class User(db.Model):
     nickname = db.Column(db.String(64), unique=True, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-    labs = db.relationship("Lab", backref="user", lazy=True, cascade="all, delete-orphan")
-    symptoms = db.relationship("Symptom", backref="user", lazy=True, cascade="all, delete-orphan")
-    medications = db.relationship("Medication", backref="user", lazy=True, cascade="all, delete-orphan")
-    gluten_scans = db.relationship("GlutenScan", backref="user", lazy=True, cascade="all, delete-orphan")
-    ai_messages = db.relationship("AIMessage", backref="user", lazy=True, cascade="all, delete-orphan")
-    profile = db.relationship("Profile", backref="user", uselist=False, cascade="all, delete-orphan")
+    labs = db.relationship("Lab", backref="user", lazy="select", cascade="all, delete-orphan")
+    symptoms = db.relationship("Symptom", backref="user", lazy="select", cascade="all, delete-orphan")
+    medications = db.relationship("Medication", backref="user", lazy="select", cascade="all, delete-orphan")
+    gluten_scans = db.relationship("GlutenScan", backref="user", lazy="select", cascade="all, delete-orphan")
+    ai_messages = db.relationship("AIMessage", backref="user", lazy="select", cascade="all, delete-orphan")
+    profile = db.relationship("Profile", backref="user", uselist=False, lazy="select", cascade="all, delete-orphan")
 
     def __repr__(self) -> str:
         return f"<User {self.nickname}>"
@@ -62,6 +80,13 @@ class Lab(db.Model):
     units = db.Column(db.String(32), nullable=True)
     test_date = db.Column(db.Date, nullable=False)
 
+    __table_args__ = (
+        db.Index("ix_labs_user_id_test_date", "user_id", "test_date"),
+        db.Index("ix_labs_user_id_test_name_test_date", "user_id", "test_name", "test_date"),
+        # Serves case-insensitive "latest TSH/FT4" lookups
+        db.Index("ix_labs_user_id_upper_test_name_test_date", "user_id", db.func.upper(test_name), "test_date"),
+    )
+
     def to_dict(self) -> dict:
         return {
             "id": self.id,
@@ -143,6 +168,10 @@ class Symptom(db.Model):
     note = db.Column(db.Text, nullable=True)
     logged_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index("ix_symptoms_user_id_logged_at", "user_id", "logged_at"),
+    )
+
     def to_dict(self) -> dict:
         return {
             "id": self.id,
@@ -165,6 +194,10 @@ class Medication(db.Model):
     time_of_day = db.Column(db.String(32), nullable=True)
     taken_at = db.Column(db.DateTime, nullable=False)
 
+    __table_args__ = (
+        db.Index("ix_medications_user_id_taken_at", "user_id", "taken_at"),
+    )
+
     def to_dict(self) -> dict:
         return {
             "id": self.id,
@@ -186,6 +219,10 @@ class GlutenScan(db.Model):
     result_tag = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index("ix_gluten_scans_user_id_created_at", "user_id", "created_at"),
+    )
+
     def to_dict(self) -> dict:
         return {
             "id": self.id,
@@ -210,4 +247,67 @@ class AIMessage(db.Model):
             "id": self.id,
             "message": self.message,
             "created_at": self.created_at.isoformat(),
-        }
\ No newline at end of file
+        }
+
+class UserRevision(db.Model):
+    """Counter bumped whenever a user's labs, symptoms, medications or scans change.
+
+    List endpoints derive their ETag from it so unchanged data can be
+    answered with 304 without re-running the list queries.
+    """
+
+    __tablename__ = "user_revisions"
+
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), primary_key=True)
+    rev = db.Column(db.Integer, nullable=False, default=0)
+
+
+_REVISIONED = (Lab, Symptom, Medication, GlutenScan)
+
+
+def bump_revision(session: Session, user_id: int) -> None:
+    """Increment a user's revision within the current transaction.
+
+    A single upsert, so concurrent writers neither lose a bump nor race to
+    insert the user's first row.
+    """
+    dialect = session.get_bind().dialect.name
+    insert = pg_insert if dialect == "postgresql" else sqlite_insert
+    stmt = insert(UserRevision).values(user_id=user_id, rev=1)
+    session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[UserRevision.user_id],
+            set_={"rev": UserRevision.rev + 1},
+        )
+    )
+
+
+@event.listens_for(Session, "before_flush")
+def _bump_revisions(session: Session, flush_context, instances) -> None:
+    user_ids = {
+        obj.user_id
+        for objs in (session.new, session.dirty, session.deleted)
+        for obj in objs
+        if isinstance(obj, _REVISIONED)
+    }
+    for user_id in user_ids:
+        bump_revision(session, user_id)
+
+
+class SchedulerRun(db.Model):
+    """Claims a scheduled job for a day.
+
+    Every worker process runs its own scheduler; the unique (job, run_date)
+    constraint lets exactly one of them insert the row and run the job.
+    """
+
+    __tablename__ = "scheduler_runs"
+
+    id = db.Column(db.Integer, primary_key=True)
+    job = db.Column(db.String(64), nullable=False)
+    run_date = db.Column(db.Date, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint("job", "run_date", name="uq_scheduler_runs_job_run_date"),
+    )
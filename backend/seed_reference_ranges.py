@@ -41,6 +41,7 @@ def seed() -> None:
                     ReferenceRange(analyte=analyte, trimester=tri, low=low, high=high, unit=unit)
                 )
         db.session.commit()
+        # Running servers pick the new values up once their cache expires (_REF_TTL)
         print("Reference ranges seeded/updated.")
 
 
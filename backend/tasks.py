@@ -7,22 +7,40 @@ as the Flask application.
 """
 
 from __future__ import annotations
-import os, requests, logging
-from datetime import datetime
-from typing import Iterable
+import os, requests, logging, hashlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import List
 
 from apscheduler.schedulers.background import BackgroundScheduler
 from flask import current_app
-from models import db, User, AIMessage
+from models import db, User, AIMessage, SchedulerRun
+from sqlalchemy.exc import IntegrityError
+from utils.gemini import get_model
+
+# Small pool for writes that do not need to finish before a response is sent
+_background = ThreadPoolExecutor(max_workers=2, thread_name_prefix="hashimom-bg")
+
+# Concurrent Gemini calls when generating messages for many users
+_AI_MAX_WORKERS = 16
 
 
 def init_scheduler(app) -> None:
     """Initialize and start the background scheduler.
 
     The scheduler is attached to the Flask application context so it
-    shares access to the database.  Jobs are added here.
+    shares access to the database.  Jobs are added here.  Today's initial
+    messages are generated by a one-shot job shortly after start-up so
+    that app boot does not wait on Gemini for every user.
     """
     scheduler = BackgroundScheduler(timezone="UTC")
+    scheduler.add_job(
+        generate_initial_messages,
+        "date",
+        run_date=datetime.utcnow() + timedelta(seconds=5),
+        args=[app],
+        id="initial_ai_messages",
+    )
 
     @scheduler.scheduled_job("interval", days=1)
     def daily_ai_message_job() -> None:
@@ -35,75 +53,131 @@ def init_scheduler(app) -> None:
         avoid crashing the scheduler.
         """
         with app.app_context():
-            users: Iterable[User] = User.query.all()
-            for user in users:
-                try:
-                    message_text = generate_ai_encouragement(user)
-                except Exception as e:
-                    logging.warning(f"AI generation failed for user {user.id}: {e}")
-                    # Fallback to a generic message on failure.
-                    message_text = "Remember to take care of yourself today! 🌟"
-                ai_msg = AIMessage(user_id=user.id, message=message_text, created_at=datetime.utcnow())
-                db.session.add(ai_msg)
+            if not claim_job_run("daily_ai_messages"):
+                return
+            users: List[User] = User.query.all()
+            # Fallback to a generic message on failure.
+            texts = _encouragements(app, users, "Remember to take care of yourself today! 🌟")
+            now = datetime.utcnow()
+            db.session.bulk_save_objects(
+                [AIMessage(user_id=u.id, message=t, created_at=now) for u, t in zip(users, texts)]
+            )
             db.session.commit()
-            logging.info(f"Generated AI messages for {len(list(users))} users")
+            logging.info(f"Generated AI messages for {len(users)} users")
 
     scheduler.start()
 
 
+def persist_ai_message(app, user_id: int, message: str, created_at: datetime) -> None:
+    """Insert an `AIMessage` from a background thread.
+
+    Runs in its own application context (and therefore its own session) so
+    the calling request can return without waiting for the commit.
+    """
+    def _write() -> None:
+        with app.app_context():
+            try:
+                db.session.add(AIMessage(user_id=user_id, message=message, created_at=created_at))
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logging.warning(f"Saving AI message failed for user {user_id}: {e}")
+
+    _background.submit(_write)
+
+
+def claim_job_run(job: str) -> bool:
+    """Atomically claim today's run of ``job``; False if another process has it.
+
+    Each gunicorn worker (and the debug reloader's parent and child) starts
+    its own scheduler, so without this every process would generate the
+    same messages. Must be called inside an app context.
+    """
+    db.session.add(SchedulerRun(job=job, run_date=datetime.utcnow().date()))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        logging.info(f"Skipping {job}: already claimed today by another process")
+        return False
+    return True
+
+
 def generate_initial_messages(app) -> None:
     """Generate initial AI messages for all users (for testing/setup).
     
     This is useful for immediately creating messages without waiting for the daily job.
     """
     with app.app_context():
-        users: Iterable[User] = User.query.all()
-        for user in users:
-            # Check if user already has an AI message from today
-            today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-            existing_msg = AIMessage.query.filter(
-                AIMessage.user_id == user.id,
-                AIMessage.created_at >= today_start
-            ).first()
-            
-            if not existing_msg:
-                try:
-                    message_text = generate_ai_encouragement(user)
-                except Exception as e:
-                    logging.warning(f"AI generation failed for user {user.id}: {e}")
-                    message_text = "You're doing great! Keep tracking your health journey. 💪"
-                
-                ai_msg = AIMessage(user_id=user.id, message=message_text, created_at=datetime.utcnow())
-                db.session.add(ai_msg)
-        
+        if not claim_job_run("initial_ai_messages"):
+            return
+        # Skip users who already have an AI message from today
+        today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        has_message = {
+            uid
+            for (uid,) in db.session.query(AIMessage.user_id)
+            .filter(AIMessage.created_at >= today_start)
+            .distinct()
+        }
+        users: List[User] = [u for u in User.query.all() if u.id not in has_message]
+
+        texts = _encouragements(app, users, "You're doing great! Keep tracking your health journey. 💪")
+        now = datetime.utcnow()
+        db.session.bulk_save_objects(
+            [AIMessage(user_id=u.id, message=t, created_at=now) for u, t in zip(users, texts)]
+        )
         db.session.commit()
-        logging.info(f"Generated initial AI messages for {len(list(users))} users")
+        logging.info(f"Generated initial AI messages for {len(users)} users")
+
+
+def _encouragements(app, users: List[User], fallback: str) -> List[str]:
+    """Generate one encouragement per user, running the Gemini calls concurrently.
+
+    Results are in the same order as `users`; a failed call yields `fallback`.
+    """
+    if not app.config.get("GEMINI_API_KEY"):
+        # Canned messages only need the id; skip the pool and app contexts
+        return [_fallback_encouragement(u.id) for u in users]
+
+    def _one(user: User) -> str:
+        with app.app_context():
+            try:
+                return generate_ai_encouragement(user)
+            except Exception as e:
+                logging.warning(f"AI generation failed for user {user.id}: {e}")
+                return fallback
+
+    if not users:
+        return []
+    with ThreadPoolExecutor(max_workers=min(_AI_MAX_WORKERS, len(users))) as ex:
+        return list(ex.map(_one, users))
+
+
+# Enhanced fallback messages when no API key is configured
+_FALLBACK_MESSAGES = (
+    "You're doing amazing by tracking your health! Keep it up! 🌟",
+    "Every symptom you log helps you understand your body better. Great work! 💪",
+    "Your health journey matters, and you're taking all the right steps! ✨",
+    "Consistency in health tracking shows real dedication. You've got this! 🌈",
+    "Remember: small steps every day lead to big improvements! Keep going! 🎯",
+)
+
+
+def _fallback_encouragement(user_id: int) -> str:
+    # Use user ID to select a consistent message for the day
+    today = datetime.utcnow().date().isoformat()
+    seed = hashlib.md5(f"{user_id}-{today}".encode()).hexdigest()
+    return _FALLBACK_MESSAGES[int(seed, 16) % len(_FALLBACK_MESSAGES)]
 
 
 def generate_ai_encouragement(user: User) -> str:
     """Generate an AI encouragement message for a user using Gemini API."""
     key = current_app.config.get("GEMINI_API_KEY")
     if not key:
-        # Enhanced fallback messages when no API key is configured
-        fallback_messages = [
-            "You're doing amazing by tracking your health! Keep it up! 🌟",
-            "Every symptom you log helps you understand your body better. Great work! 💪",
-            "Your health journey matters, and you're taking all the right steps! ✨",
-            "Consistency in health tracking shows real dedication. You've got this! 🌈",
-            "Remember: small steps every day lead to big improvements! Keep going! 🎯"
-        ]
-        # Use user ID to select a consistent message for the day
-        import hashlib
-        today = datetime.utcnow().date().isoformat()
-        seed = hashlib.md5(f"{user.id}-{today}".encode()).hexdigest()
-        message_index = int(seed, 16) % len(fallback_messages)
-        return fallback_messages[message_index]
+        return _fallback_encouragement(user.id)
 
     try:
-        import google.generativeai as genai
-        genai.configure(api_key=key)
-        
-        model = genai.GenerativeModel('gemini-2.0-flash')
+        model = get_model(key)
         prompt = f"""You are a supportive health tracking assistant. Generate one brief, encouraging message (1-2 sentences) for someone named {user.nickname} who is tracking their health symptoms and lab results. Be warm, supportive, and motivational about their health journey."""
         
         response = model.generate_content(prompt)
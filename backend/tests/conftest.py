@@ -0,0 +1,31 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Config reads the database URL at import time, so point it at a throwaway
+# SQLite file before the app modules are imported.
+_DB_DIR = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'test.db')}"
+os.environ.pop("GEMINI_API_KEY", None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def app():
+    app = create_app()
+    app.config.update(TESTING=True)
+    return app
+
+
+@pytest.fixture()
+def client(app, request):
+    # One user per test keeps data from other tests out of the responses
+    client = app.test_client()
+    resp = client.post("/api/login", json={"nickname": request.node.name})
+    assert resp.status_code == 200
+    client.user_id = resp.get_json()["user_id"]
+    return client
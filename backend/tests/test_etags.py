@@ -0,0 +1,30 @@
+from models import User, UserRevision, bump_revision, db
+
+
+def test_list_returns_304_until_data_changes(client):
+    first = client.get("/api/medications")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert "must-revalidate" in first.headers["Cache-Control"]
+
+    assert client.get("/api/medications", headers={"If-None-Match": etag}).status_code == 304
+
+    resp = client.post("/api/medications", json={"medication_name": "Levothyroxine", "dose": "50mcg"})
+    assert resp.status_code == 201
+
+    after = client.get("/api/medications", headers={"If-None-Match": etag})
+    assert after.status_code == 200
+    assert after.headers["ETag"] != etag
+
+
+def test_bump_revision_creates_then_increments(app):
+    with app.app_context():
+        user = User(nickname="revision-user")
+        db.session.add(user)
+        db.session.commit()
+
+        bump_revision(db.session, user.id)
+        bump_revision(db.session, user.id)
+        db.session.commit()
+
+        assert db.session.get(UserRevision, user.id).rev == 2
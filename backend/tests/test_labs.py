@@ -0,0 +1,56 @@
+from datetime import date, timedelta
+
+
+def _create_lab(client, **overrides):
+    payload = {"test_name": "TSH", "result": "2.1", "units": "mIU/L", "test_date": "2024-03-01"}
+    payload.update(overrides)
+    resp = client.post("/api/labs", json=payload)
+    assert resp.status_code == 201
+    return resp.get_json()
+
+
+def test_get_lab_returns_enriched_row(client):
+    _create_lab(client, result="2.0", test_date="2024-02-01")
+    lab = _create_lab(client, result="3.0", test_date="2024-03-01")
+
+    resp = client.get(f"/api/labs/{lab['id']}")
+
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data["id"] == lab["id"]
+    assert data["test_name"] == "TSH"
+    assert data["delta"] == lab["delta"]
+    assert "trimester" in data
+
+
+def test_get_lab_missing_is_404(client):
+    assert client.get("/api/labs/999999").status_code == 404
+
+
+def test_delete_lab(client):
+    lab = _create_lab(client)
+    resp = client.delete(f"/api/labs/{lab['id']}")
+    assert resp.status_code == 200
+    assert client.get(f"/api/labs/{lab['id']}").status_code == 404
+
+
+def test_reference_range_changes_are_picked_up_after_ttl(app, client, monkeypatch):
+    from api import labs as labs_api
+    from models import Profile, ReferenceRange, db
+
+    with app.app_context():
+        db.session.add(Profile(user_id=client.user_id, lmp_date=date.today() - timedelta(weeks=8)))
+        db.session.add(ReferenceRange(analyte="TTLX", trimester="T1", low=1.0, high=2.0, unit="u"))
+        db.session.commit()
+
+    lab = _create_lab(client, test_name="TTLX", result="1.5")
+    assert lab["ref_high"] == 2.0
+
+    with app.app_context():
+        ReferenceRange.query.filter_by(analyte="TTLX").one().high = 3.0
+        db.session.commit()
+
+    # Still served from the cache until it expires
+    assert client.get(f"/api/labs/{lab['id']}").get_json()["ref_high"] == 2.0
+    monkeypatch.setattr(labs_api, "_REF_TTL", 0.0)
+    assert client.get(f"/api/labs/{lab['id']}").get_json()["ref_high"] == 3.0
@@ -0,0 +1,29 @@
+from datetime import date, timedelta
+
+
+def test_profile_reports_gestational_age(client):
+    lmp = date.today() - timedelta(weeks=13, days=2)
+    resp = client.put("/api/profile", json={"lmp_date": lmp.isoformat(), "high_risk_notes": "note"})
+    assert resp.status_code == 200
+
+    data = client.get("/api/profile").get_json()
+    assert data["gestational_age_weeks"] == 13
+    assert data["trimester"] == "T2"
+    assert data["high_risk_notes"] == "note"
+
+
+def test_profile_by_due_date(client):
+    due = date.today() + timedelta(weeks=30)
+    client.put("/api/profile", json={"due_date": due.isoformat()})
+
+    data = client.get("/api/profile").get_json()
+    assert data["gestational_age_weeks"] == 10
+    assert data["trimester"] == "T1"
+
+
+def test_profile_etag(client):
+    client.put("/api/profile", json={"lmp_date": date.today().isoformat()})
+
+    first = client.get("/api/profile")
+    etag = first.headers["ETag"]
+    assert client.get("/api/profile", headers={"If-None-Match": etag}).status_code == 304
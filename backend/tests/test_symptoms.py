@@ -0,0 +1,19 @@
+def test_list_symptoms_attaches_latest_labs_per_day(client):
+    for name, result, day in (("TSH", "2.0", "2024-03-01"), ("FT4", "1.1", "2024-03-05"), ("TSH", "4.0", "2024-04-01")):
+        payload = {"test_name": name, "result": result, "test_date": day}
+        if name == "TSH":
+            payload["units"] = "mIU/L"
+        assert client.post("/api/labs", json=payload).status_code == 201
+    for logged_at in ("2024-02-20T09:00:00", "2024-03-10T08:00:00", "2024-03-10T20:00:00"):
+        resp = client.post("/api/symptoms", json={"symptom": "fatigue", "severity": 3, "logged_at": logged_at})
+        assert resp.status_code == 201
+
+    resp = client.get("/api/symptoms", query_string={"symptom_name": "fatigue"})
+
+    assert resp.status_code == 200
+    rows = resp.get_json()
+    assert [r["logged_at"][:10] for r in rows] == ["2024-03-10", "2024-03-10", "2024-02-20"]
+    assert rows[0]["related_lab_event"] == {"date": "2024-03-05", "summary": "TSH=2.0 mIU/L, FT4=1.1"}
+    assert rows[1]["related_lab_event"] == rows[0]["related_lab_event"]
+    assert rows[2]["related_lab_event"] is None
+    assert all(r["related_gluten_event"] is False for r in rows)
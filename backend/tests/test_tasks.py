@@ -0,0 +1,28 @@
+from models import AIMessage, SchedulerRun, User, db
+from tasks import claim_job_run, generate_initial_messages
+
+
+def test_job_run_is_claimed_once_per_day(app):
+    with app.app_context():
+        assert claim_job_run("test_job") is True
+        assert claim_job_run("test_job") is False
+        assert claim_job_run("other_test_job") is True
+        assert SchedulerRun.query.filter_by(job="test_job").count() == 1
+
+
+def test_initial_messages_run_once(app):
+    with app.app_context():
+        SchedulerRun.query.filter_by(job="initial_ai_messages").delete()
+        db.session.add(User(nickname="initial-messages-user"))
+        db.session.commit()
+
+    generate_initial_messages(app)
+    # A second process starting the same day finds the job already claimed
+    with app.app_context():
+        assert AIMessage.query.count() > 0
+        AIMessage.query.delete()
+        db.session.commit()
+    generate_initial_messages(app)
+
+    with app.app_context():
+        assert AIMessage.query.count() == 0
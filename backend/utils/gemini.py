@@ -0,0 +1,21 @@
+"""Shared Gemini client.
+
+The SDK is configured and the model object built once per process and per
+API key; request handlers and jobs reuse it instead of rebuilding it on
+every call.
+"""
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Any
+
+MODEL_NAME = "gemini-2.0-flash"
+
+
+@lru_cache(maxsize=1)
+def get_model(api_key: str) -> Any:
+    """Return the process-wide ``GenerativeModel`` for ``api_key``."""
+    import google.generativeai as genai
+
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(MODEL_NAME)
@@ -1,17 +1,18 @@
 from __future__ import annotations
 
+from bisect import bisect_left
 from datetime import date, timedelta
 from typing import Dict
 
+# Last completed week of T1 and T2 (inclusive upper bounds)
+_TRI_BOUNDS = (12, 27)
+_TRI_LABELS = ("T1", "T2", "T3")
+
 
 def _classify_trimester(weeks: int | None) -> str:
     if weeks is None:
         return "-"
-    if weeks <= 12:
-        return "T1"
-    if weeks <= 27:
-        return "T2"
-    return "T3"
+    return _TRI_LABELS[bisect_left(_TRI_BOUNDS, weeks)]
 
 
 def calculate_by_lmp(lmp_date: date, today: date) -> Dict[str, object]:
@@ -0,0 +1,38 @@
+"""Flask JSON provider backed by orjson."""
+from __future__ import annotations
+
+from typing import Any
+
+import orjson
+from flask import Response
+from flask.json.provider import DefaultJSONProvider
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Serialize responses and parse request bodies with orjson.
+
+    Keys stay sorted like Flask's default provider. Types orjson does not
+    handle itself fall back to ``DefaultJSONProvider.default``; dates and
+    datetimes are written as ISO 8601 strings.
+    """
+
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SORT_KEYS
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        option = self.option
+        if kwargs.get("indent"):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        # jsonify() goes through here. Hand orjson's bytes straight to the
+        # response instead of round-tripping them through str. Debug mode
+        # keeps the indented output from the default implementation.
+        if self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=self.option)
+        return self._app.response_class(body, mimetype=self.mimetype)